@@ -8,161 +8,479 @@ Just uses the python socketserver library.  Does not require numpy.
 
 This is useful for running on rudimentary servers, e.g. old Raspberry Pi's
 or embedded processors.
+
+The hot-path methods carry type annotations, so on hosts that do have a
+compiler the whole module can optionally be compiled with mypyc
+("mypyc nano_sipyco.py") to remove bytecode-dispatch overhead from the
+request loop; the pure-python module is the fallback and requires nothing.
 '''
 
+import os
 import sys
+import ast
+import json
+import types
 import logging
+import functools
+import threading
 import inspect
+import socket
+import signal
 import argparse
-import traceback
+import asyncio
 import socketserver
+import queue
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None	# optional, only needed for the msgpack wire codec
 
 logger = logging.getLogger(__name__)
-VERBOSE_DEBUG = True
+VERBOSE_DEBUG = False
+RECV_SIZ = 4096		# bytes per socket recv() in the handler read loop
+SND_BUF_SIZ = 256 * 1024	# requested SO_SNDBUF for accepted connections
+SENDMSG_MAX_IOV = 1024		# POSIX IOV_MAX floor; max buffers per sendmsg
 
 #-----------------------------------------------------------------------------
 
 class MyPyon:
     '''
     Dummy replacement for sipyco.pyon (python object notation) which returns a string version
-    of a python object
+    of a python object.
+
+    Decoding uses json.loads (implemented in C) when possible, falling back to
+    ast.literal_eval for Python-only literals like tuples, e.g. (4, 9).  Never
+    uses eval(), so untrusted input cannot execute code.
     '''
-    def __init__(self):
-        return
+    use_newline_framing = True
 
-    def encode(self, obj):
-        return repr(obj)
+    def __init__(self, use_json=True):
+        '''
+        use_json = (bool) if True, encode with json.dumps when the object is
+                   JSON-representable (falls back to repr otherwise)
+        '''
+        self._use_json = use_json
 
-    def decode(self, line):
-        try:
-            obj = line.decode()	# default - return string
-        except Exception as err:
-            obj = line
-        if line.startswith("{") or line.startswith("["):
+    def encode_frame(self, obj) -> bytes:
+        '''
+        Encode obj and append the newline delimiter: a complete wire frame
+        '''
+        return self.encode(obj) + b"\n"
+
+    @staticmethod
+    def _json_default(obj):
+        '''
+        Make json.dumps handle the non-JSON python types we care about
+        (tuples are handled natively by json; sets become lists)
+        '''
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def encode(self, obj: object) -> bytes:
+        '''
+        Encode obj to wire-ready bytes (no trailing newline), avoiding an
+        intermediate str->bytes copy at every call site.
+        '''
+        if self._use_json:
             try:
-                obj = eval(line)
-            except Exception as err:
+                return json.dumps(obj, default=self._json_default).encode("ascii")
+            except (TypeError, ValueError):
                 pass
-        return obj
+        return repr(obj).encode("utf-8", "surrogateescape")
+
+    def decode(self, line) -> object:
+        '''
+        Decode a wire message (bytes or str) to a python object.
+        Decodes to str exactly once, then dispatches on the first character:
+        container literals are parsed, anything else is returned as the
+        string itself.
+        '''
+        if isinstance(line, (bytes, bytearray)):
+            s = line.decode("utf-8", "replace")
+        else:
+            s = line
+        if s[:1] in ("{", "[", "("):
+            try:
+                return json.loads(s)
+            except ValueError:
+                return ast.literal_eval(s)
+        return s
 
 #-----------------------------------------------------------------------------
 
-class NanoNDSPHandler(socketserver.StreamRequestHandler):
+class JsonCodec:
     """
-    Handler for NDSP server which does not need sipyco, and only uses python sockets.
-    This version does not use asyncio; it is a handler for a TCP/IP socketserver.
+    Strict JSON wire codec, negotiated with the b"ARTIQ json" init string.
+    Frames are newline-delimited like PYON, but there is no python-literal
+    fallback, making the protocol language-neutral for non-python clients.
+    """
+    use_newline_framing = True
+    _use_json = True
 
-    Basic protocol:
-    
-    [MyServer] Received 1: 'b'ARTIQ pc_rpc\n''
-    [MyServer] Received 2: 'b'example_adder\n''
-    [MyServer] Received 3: 'b'{"action": "call", "name": "add", "args": (4, 9), "kwargs": {}}\n''
-    [MyServer] sending: '{"status": "ok", "ret": 13}'
-    [MyServer] Received 4: 'b'''
+    def encode(self, obj) -> bytes:
+        return json.dumps(obj, default=MyPyon._json_default).encode("ascii")
+
+    def encode_frame(self, obj) -> bytes:
+        return self.encode(obj) + b"\n"
 
+    def decode(self, payload) -> object:
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode("utf-8", "replace")
+        return json.loads(payload)
+
+class MsgpackCodec:
     """
-    _init_string = b"ARTIQ pc_rpc\n"
+    msgpack wire codec, negotiated with the b"ARTIQ msgpack" init string.
+    Messages after the init line are length-prefixed (4-byte big-endian)
+    binary frames, so neither side scans for a delimiter.  Requires the
+    optional msgpack package; negotiation fails if it is not installed.
+    """
+    use_newline_framing = False
+    _use_json = False
 
-    @staticmethod
-    def _document_function(function):
-        """
-        Turn a function into a tuple of its arguments and documentation.
+    def encode(self, obj) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True, default=MyPyon._json_default)
+
+    def encode_frame(self, obj) -> bytes:
+        payload = self.encode(obj)
+        return struct.pack(">I", len(payload)) + payload
+
+    def decode(self, payload) -> object:
+        return msgpack.unpackb(payload, raw=False)
+
+#-----------------------------------------------------------------------------
+
+def _tune_socket(sock):
+    '''
+    Per-connection TCP tuning: disable Nagle so small replies go out
+    immediately, enable keepalive so dead peers are eventually noticed, and
+    enlarge the send buffer so bursts of replies do not stall the handler.
+    '''
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SND_BUF_SIZ)
+
+#-----------------------------------------------------------------------------
 
-        Allows remote inspection of what methods are available on a local device.
+def _enumerate_methods(target):
+    '''
+    Return [(name, function), ...] for the public methods of target, by
+    scanning the class dicts along type(target).__mro__.
+
+    Unlike inspect.getmembers, this never getattr()s the instance, so
+    property/descriptor side effects (which can touch hardware on device
+    targets) are not triggered, and there is no sorted dir() walk.
+    '''
+    seen = set()
+    out = []
+    for klass in type(target).__mro__:
+        for name, val in vars(klass).items():
+            if name.startswith("_") or name in seen:
+                continue
+            seen.add(name)	# respect MRO shadowing even for non-functions
+            if isinstance(val, types.FunctionType):
+                out.append((name, val))
+    return out
+
+#-----------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def _document_function(function):
+    """
+    Turn a function into a tuple of its arguments and documentation.
+
+    Allows remote inspection of what methods are available on a local device.
+
+    Args:
+        function (Callable): a Python function to be documented.
+
+    Returns:
+        Tuple[dict, str]: tuple of (argument specifications,
+        function documentation).
+        Any type annotations are converted to strings (for PYON serialization).
+
+    The result is memoized per function object: getfullargspec re-walks the
+    signature machinery on every call, but a method's documentation never
+    changes at runtime.
+    """
+    argspec_dict = dict(inspect.getfullargspec(function)._asdict())
+    # Fix issue #1186: PYON can't serialize type annotations.
+    if any(argspec_dict.get("annotations", {})):
+        argspec_dict["annotations"] = str(argspec_dict["annotations"])
+    return argspec_dict, inspect.getdoc(function)
+
+#-----------------------------------------------------------------------------
 
-        Args:
-            function (Callable): a Python function to be documented.
+class NanoNDSPProtocol:
+    '''
+    NDSP protocol logic (method reflection, dispatch, action processing)
+    shared by the socketserver handler and the asyncio server.  Users of this
+    mixin provide a .server attribute with pyon, targets and the caches.
+    '''
+    _init_string = b"ARTIQ pc_rpc\n"
 
-        Returns:
-            Tuple[dict, str]: tuple of (argument specifications,
-            function documentation).
-            Any type annotations are converted to strings (for PYON serialization).
-        """
-        argspec_dict = dict(inspect.getfullargspec(function)._asdict())
-        # Fix issue #1186: PYON can't serialize type annotations.
-        if any(argspec_dict.get("annotations", {})):
-            argspec_dict["annotations"] = str(argspec_dict["annotations"])
-        return argspec_dict, inspect.getdoc(function)
+    def _select_codec(self, init_line):
+        '''
+        Map the client's init line to a wire codec instance, or None if the
+        init line is unknown (or names an unavailable codec).
+        '''
+        if init_line == self._init_string:
+            return self.server.pyon		# legacy PYON
+        if init_line == b"ARTIQ json\n":
+            return JsonCodec()
+        if init_line == b"ARTIQ msgpack\n" and msgpack is not None:
+            return MsgpackCodec()
+        return None
+
+    def _get_method_info(self, target):
+        '''
+        Return (valid_methods, doc, methods_frame) for target, where
+        valid_methods is the set of method names, doc is the documented-method
+        dict served for get_rpc_method_list, and methods_frame is the
+        pre-encoded handshake frame listing the methods.
+
+        Reflection (inspect.getmembers + getfullargspec) is slow, so the
+        result is cached on the server keyed by type(target); each target
+        class pays the cost once, subsequent connections get a dict lookup.
+        '''
+        info = self.server._method_cache.get(type(target))
+        if info is None:
+            members = _enumerate_methods(target)
+            valid_methods = {name for name, _ in members}
+            doc = {
+                "docstring": inspect.getdoc(target),
+                "methods": {}
+            }
+            for name, func in members:
+                doc["methods"][name] = _document_function(func)
+            methods_frame = self.server.pyon.encode(valid_methods) + b"\n"
+            info = (valid_methods, doc, methods_frame)
+            self.server._method_cache[type(target)] = info
+        return info
+
+    def _bind_target(self, target):
+        '''
+        Bind each public method of target once, so "call" dispatch is one
+        dict lookup instead of a getattr (MRO walk + bound-method alloc).
+        Returns the pre-encoded methods frame for the handshake.
+        '''
+        valid_methods, _, msg = self._get_method_info(target)
+        #if self.builtin_terminate:
+        #    valid_methods.add("terminate")
+        self._dispatch = {name: getattr(target, name)
+                          for name in valid_methods
+                          if not name.startswith("_")}
+        if self._codec is not self.server.pyon:
+            # cached frame is PYON-encoded; re-frame for negotiated codecs
+            msg = self._codec.encode_frame(sorted(valid_methods))
+        return msg
+
+    def _do_list(self, target, obj):
+        '''
+        Handle the "get_rpc_method_list" action
+        '''
+        _, doc, _ = self._get_method_info(target)
+        logger.debug("RPC docs for %s: %s", target, doc)
+        return doc
 
-    def _process_action(self, target, obj):
+    def _do_call(self, target, obj):
+        '''
+        Handle the "call" action
+        '''
+        logger.debug("calling %s", obj)
+        try:
+            method = self._dispatch[obj["name"]]
+        except KeyError:
+            raise ValueError("Unknown method: {}".format(obj["name"]))
+        return method(*obj["args"], **obj["kwargs"])
+
+    # one dict lookup resolves the action to its handler, instead of a chain
+    # of string compares with repeated obj["action"] indexing
+    _ACTIONS = {
+        "call": _do_call,
+        "get_rpc_method_list": _do_list,
+    }
+
+    def _process_action(self, target: object, obj: dict) -> object:
         '''
         Perform requested action (specified in obj) to specified target
         '''
+        action = obj.get("action")
         try:
-            if obj["action"] == "get_rpc_method_list":
-                members = inspect.getmembers(target, inspect.ismethod)
-                doc = {
-                    "docstring": inspect.getdoc(target),
-                    "methods": {}
-                }
-                for name, method in members:
-                    if name.startswith("_"):
-                        continue
-                    method = getattr(target, name)
-                    doc["methods"][name] = self._document_function(method)
-                logger.debug("RPC docs for %s: %s", target, doc)
-                return doc
-            elif obj["action"] == "call":
-                logger.debug(f"calling {obj}")
-                if 0:
-                    return None
-                else:
-                    method = getattr(target, obj["name"])
-                    ret = method(*obj["args"], **obj["kwargs"])
-                    return ret
-            else:
-                raise ValueError("Unknown action: {}"
-                                 .format(obj["action"]))
+            handler = self._ACTIONS[action]
+        except (KeyError, TypeError):
+            raise ValueError("Unknown action: {}".format(action))
+        return handler(self, target, obj)
 
-        except Exception as err:
-            raise
-
-    def _process_and_pyonize(self, target, obj):
+    def _process_and_pyonize(self, target: object, msg: bytes) -> bytes:
         '''
-        Call target procedure, encode return using pyon, and return dict with status ok
+        Decode the request message, call the target procedure, encode the
+        status-ok reply with the connection's codec, and return it as a
+        complete wire frame (bytes) ready for a single sendall().
+        Decode errors, like call errors, become a status-failed reply.
         '''
+        codec = self._codec
         try:
-            return self.server.pyon.encode({
+            ret = self._process_action(target, codec.decode(msg))
+            if codec._use_json and (ret is None or type(ret) in (int, float, bool)):
+                # fast path: skip building the wrapper dict for primitive returns
+                return b'{"status": "ok", "ret": ' + json.dumps(ret).encode("ascii") + b'}\n'
+            return codec.encode_frame({
                 "status": "ok",
-                "ret": self._process_action(target, obj)
+                "ret": ret
             })
         except Exception as err:
-            print(f"[NanoNDSPServer] Error!  {err} at {traceback.format_exc()}")
-            return self.server.pyon.encode({
+            logger.exception("[NanoNDSPServer] Error!  %s", err)
+            return codec.encode_frame({
                 "status": "failed",
                 "exception": str(err),
             })
 
+#-----------------------------------------------------------------------------
+
+class NanoNDSPHandler(NanoNDSPProtocol, socketserver.BaseRequestHandler):
+    """
+    Handler for NDSP server which does not need sipyco, and only uses python sockets.
+    This version does not use asyncio; it is a handler for a TCP/IP socketserver.
+
+    Deliberately based on BaseRequestHandler, not StreamRequestHandler: all
+    I/O goes through the raw socket (buffered recv() + sendall()), with no
+    makefile()/BufferedReader layer, its lock, or its per-line scanning in
+    the way of small transactions.
+
+    Basic protocol:
+
+    [MyServer] Received 1: 'b'ARTIQ pc_rpc\n''
+    [MyServer] Received 2: 'b'example_adder\n''
+    [MyServer] Received 3: 'b'{"action": "call", "name": "add", "args": (4, 9), "kwargs": {}}\n''
+    [MyServer] sending: '{"status": "ok", "ret": 13}'
+    [MyServer] Received 4: 'b'''
+
+    """
+    def setup(self):
+        super().setup()
+        _tune_socket(self.request)
+        self._buf = bytearray()
+        self._codec = self.server.pyon	# until the init line negotiates one
+
+    def _readline(self) -> bytes:
+        '''
+        Return the next newline-terminated line from the socket (newline
+        included), reading RECV_SIZ-byte chunks into a persistent buffer so
+        several pipelined messages cost a single recv() syscall.
+        Returns b"" at end of stream.
+        '''
+        buf = self._buf
+        while True:
+            nl = buf.find(b"\n")
+            if nl != -1:
+                line = bytes(buf[:nl + 1])
+                del buf[:nl + 1]
+                return line
+            chunk = self.request.recv(RECV_SIZ)
+            if not chunk:
+                return b""
+            buf += chunk
+
+    def _next_buffered_message(self):
+        '''
+        Return the next complete message already sitting in the buffer, or
+        None.  A message is a newline-terminated line for line-framed codecs,
+        or a 4-byte big-endian length-prefixed frame (prefix stripped) for
+        binary codecs.
+        '''
+        buf = self._buf
+        if self._codec.use_newline_framing:
+            nl = buf.find(b"\n")
+            if nl == -1:
+                return None
+            msg = bytes(buf[:nl + 1])
+            del buf[:nl + 1]
+            return msg
+        if len(buf) >= 4:
+            (length,) = struct.unpack(">I", bytes(buf[:4]))
+            if len(buf) >= 4 + length:
+                msg = bytes(buf[4:4 + length])
+                del buf[:4 + length]
+                return msg
+        return None
+
+    def _read_message(self) -> bytes:
+        '''
+        Blocking version of _next_buffered_message: recv()s until a complete
+        message is available.  Returns b"" at end of stream.
+        '''
+        while True:
+            msg = self._next_buffered_message()
+            if msg is not None:
+                return msg
+            chunk = self.request.recv(RECV_SIZ)
+            if not chunk:
+                return b""
+            self._buf += chunk
+
+    def _send_replies(self, replies):
+        '''
+        Flush a batch of reply frames.  On POSIX, socket.sendmsg hands the
+        list to the kernel as an iovec (scatter-gather writev), skipping the
+        user-space b"".join copy; a short send is resumed from the remainder.
+        '''
+        if len(replies) == 1:
+            self.request.sendall(replies[0])
+            return
+        if not hasattr(self.request, "sendmsg"):
+            self.request.sendall(b"".join(replies))	# windows fallback
+            return
+        buffers = [memoryview(r) for r in replies]
+        while buffers:
+            # the kernel rejects more than IOV_MAX (1024 on linux) iovecs
+            # per call with EMSGSIZE, so feed it capped slices
+            sent = self.request.sendmsg(buffers[:SENDMSG_MAX_IOV])
+            # discard buffers that went out whole, trim a partial one
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                del buffers[0]
+            if sent:
+                buffers[0] = buffers[0][sent:]
+
     def handle(self):
-        reader = self.rfile        # self.rfile is a file-like object created by the handler
-        writer = self.wfile
-        pyon = self.server.pyon
+        # evaluate the debug gate once per connection; when off, the hot loop
+        # does no string formatting at all
+        debug_on = VERBOSE_DEBUG and logger.isEnabledFor(logging.DEBUG)
 
         try:
             linecnt = 0
-            line = reader.readline()
-            if line != self._init_string:
+            line = self._readline()
+            codec = self._select_codec(line)
+            if codec is None:
                 return
+            self._codec = codec
 
             linecnt += 1
-            if VERBOSE_DEBUG:
-                print(f"[MyServer] Received {linecnt}: '{line}'")
+            if debug_on:
+                logger.debug("[MyServer] Received %d: %r", linecnt, line)
 
-            obj = {
-                "targets": sorted(self.server.targets.keys()),
-                "description": self.server.description
-            }
-            line = pyon.encode(obj) + "\n"
-            writer.write(line.encode())
-            line = reader.readline()
-            if not line:
+            if codec is self.server.pyon:
+                # first handshake reply is invariant for the server's
+                # lifetime; send the bytes pre-encoded at __init__ time
+                self.request.sendall(self.server._handshake_frame)
+            else:
+                self.request.sendall(codec.encode_frame(self.server._handshake_obj))
+            msg = self._read_message()
+            if not msg:
                 return
 
             linecnt += 1
-            if VERBOSE_DEBUG:
-                print(f"[MyServer] Received {linecnt}: '{line}'")
+            if debug_on:
+                logger.debug("[MyServer] Received %d: %r", linecnt, msg)
 
-            target_name = line.decode()[:-1]
+            if codec.use_newline_framing:
+                target_name = msg.decode()[:-1]
+            else:
+                target_name = codec.decode(msg)
             try:
                 target = self.server.targets[target_name]
             except KeyError:
@@ -171,43 +489,204 @@ class NanoNDSPHandler(socketserver.StreamRequestHandler):
             if callable(target):
                 target = target()
 
-            valid_methods = inspect.getmembers(target, inspect.ismethod)
-            valid_methods = {m[0] for m in valid_methods}
-            #if self.builtin_terminate:
-            #    valid_methods.add("terminate")
-            msg = (pyon.encode(valid_methods) + "\n").encode()
-            if VERBOSE_DEBUG:
-                print(f"[MyServer] sending msg={msg}")
-            writer.write(msg)
+            msg = self._bind_target(target)
+            if debug_on:
+                logger.debug("[MyServer] sending msg=%r", msg)
+            self.request.sendall(msg)
 
+            # When a client pipelines several RPCs into one TCP segment they
+            # all land in self._buf together; process every complete message
+            # in the buffer and flush the replies with a single sendall(), so
+            # a batch of N requests costs one send syscall instead of N.
+            replies = []
             while True:
-                line = reader.readline()
+                msg = self._read_message()
 
                 linecnt += 1
-                if VERBOSE_DEBUG:
-                    print(f"[MyServer] Received {linecnt}: '{line}'")
+                if debug_on:
+                    logger.debug("[MyServer] Received %d: %r", linecnt, msg)
 
-                if not line:
+                if not msg:
                     break
-                reply = self._process_and_pyonize(target, pyon.decode(line.decode()))
-
-                if VERBOSE_DEBUG:
-                    print(f"[MyServer] sending: '{reply}'")
-                writer.write((reply + "\n").encode())
+                replies.append(self._process_and_pyonize(target, msg))
+
+                # drain any further complete messages already buffered
+                while True:
+                    msg = self._next_buffered_message()
+                    if msg is None:
+                        break
+                    linecnt += 1
+                    if debug_on:
+                        logger.debug("[MyServer] Received %d: %r", linecnt, msg)
+                    replies.append(self._process_and_pyonize(target, msg))
+
+                if debug_on:
+                    logger.debug("[MyServer] sending: %r", replies)
+                self._send_replies(replies)
+                replies.clear()
         except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
             # May happen on Windows when client disconnects
             pass
-        finally:
-            writer.close()
 
 #-----------------------------------------------------------------------------
 
 class NanoNDSPServer(socketserver.TCPServer):
     '''
     TCP/IP socket server for NDSP.
-    This version is single-thread, but could re-mix this to make it threaded.
+    Connections are serviced by a bounded thread pool, so one slow RPC
+    does not block every other client.
     '''
     allow_reuse_address = True
+
+    def __init__(self, targets, description="", host="localhost", port=3478,
+                 max_workers=None, workers=1):
+        '''
+        targets = (dict or callable) dict of {procedure_name, <procedure>, ...},
+                  or a zero-argument factory returning such a dict.  A factory
+                  is required for workers > 1, so each process constructs its
+                  own (fork-safe) targets after the fork.
+        description = (str) string description of this server
+        host = (str) hostname or IP address to bind port on
+        port = (int) TCP/IP port number to use
+        max_workers = (int) number of handler threads (default: cpu count)
+        workers = (int) number of server processes; if > 1, serve_forever()
+                  forks workers-1 children, each binding the port with
+                  SO_REUSEPORT so the kernel spreads connections across them,
+                  sidestepping the GIL for CPU-bound RPCs (POSIX only)
+        '''
+        self.pyon = MyPyon()
+        self.targets = targets
+        self.description = description
+        self.workers = workers
+        self._worker_pids = []
+        self._method_cache = {}		# type(target) -> (valid_methods, doc, frame)
+        if callable(targets):
+            self._handshake_frame = None	# built post-fork in serve_forever
+        else:
+            self._refresh_handshake_frame()
+        self._max_workers = max_workers or os.cpu_count() or 4
+        self._queue = queue.SimpleQueue()
+        self._start_pool_workers()
+        # bound on accepted-but-unserviced connections; beyond this, reject
+        self._slots = threading.Semaphore(2 * self._max_workers)
+        super().__init__((host, port), NanoNDSPHandler)
+
+    def _refresh_handshake_frame(self):
+        # targets are fixed once resolved, so sort them exactly once; the
+        # tuple also feeds the pre-encoded handshake frame
+        self.sorted_targets = tuple(sorted(self.targets.keys()))
+        self._handshake_obj = {
+            "targets": list(self.sorted_targets),
+            "description": self.description
+        }
+        self._handshake_frame = self.pyon.encode(self._handshake_obj) + b"\n"
+
+    def server_bind(self):
+        # set SO_REUSEPORT ourselves rather than via the allow_reuse_port
+        # class attribute, which socketserver only honors on python >= 3.11;
+        # the forked workers need it on older interpreters too
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def _start_pool_workers(self):
+        '''
+        Spawn the fixed pool of daemon worker threads: no per-connection
+        spawn cost, and a busy handler cannot block interpreter exit.
+        '''
+        for n in range(self._max_workers):
+            threading.Thread(target=self._pool_worker, name=f"ndsp-{n}",
+                             daemon=True).start()
+
+    def serve_forever(self, poll_interval=0.5):
+        '''
+        Serve requests until shutdown, first forking workers-1 extra server
+        processes if configured; each process accepts on its own
+        SO_REUSEPORT-bound listening socket and runs its own thread pool.
+        '''
+        if self.workers > 1:
+            if not hasattr(socket, "SO_REUSEPORT"):
+                raise ValueError("workers > 1 requires SO_REUSEPORT support")
+            for _ in range(self.workers - 1):
+                pid = os.fork()
+                if pid == 0:
+                    # child: bind an own listening socket so the kernel
+                    # distributes connections with per-flow affinity, and
+                    # respawn the pool (threads do not survive fork)
+                    self.socket.close()
+                    self.socket = socket.socket(self.address_family,
+                                                self.socket_type)
+                    self.server_bind()
+                    self.server_activate()
+                    self._worker_pids = []
+                    self._start_pool_workers()
+                    break
+                self._worker_pids.append(pid)
+        if callable(self.targets):
+            # factory: construct targets post-fork, so forked processes do
+            # not share target state with the parent
+            self.targets = self.targets()
+            self._refresh_handshake_frame()
+        super().serve_forever(poll_interval)
+
+    def server_close(self):
+        super().server_close()
+        for pid in self._worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self._worker_pids = []
+
+    def process_request(self, request, client_address):
+        '''
+        Hand the connection to the worker pool instead of servicing it inline.
+        If the pool backlog is full, reply "busy" and drop the connection.
+        '''
+        if not self._slots.acquire(blocking=False):
+            try:
+                msg = self.pyon.encode({"status": "failed",
+                                        "exception": "server busy"})
+                request.sendall(msg + b"\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._queue.put((request, client_address))
+
+    def _pool_worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self._slots.release()
+
+#-----------------------------------------------------------------------------
+
+class _AsyncNDSPSession(NanoNDSPProtocol):
+    '''
+    Per-connection protocol state for NanoNDSPAsyncServer.
+    '''
+    def __init__(self, server):
+        self.server = server
+        self._codec = server.pyon
+
+class NanoNDSPAsyncServer:
+    '''
+    asyncio variant of NanoNDSPServer, speaking the same wire protocol.
+
+    One OS thread services every connection via the event loop, so this
+    scales to hundreds of mostly-idle clients (e.g. monitoring) at roughly
+    a coroutine's worth of memory per connection instead of a thread stack.
+    Use NanoNDSPServer when RPCs are few but long-running.
+    '''
     def __init__(self, targets, description="", host="localhost", port=3478):
         '''
         targets = (dict) dict of {procedure_name, <procedure>, ...}
@@ -218,7 +697,73 @@ class NanoNDSPServer(socketserver.TCPServer):
         self.pyon = MyPyon()
         self.targets = targets
         self.description = description
-        super().__init__((host, port), NanoNDSPHandler)
+        self.host = host
+        self.port = port
+        self._method_cache = {}		# type(target) -> (valid_methods, doc, frame)
+        self.sorted_targets = tuple(sorted(targets.keys()))
+        self._handshake_obj = {
+            "targets": list(self.sorted_targets),
+            "description": description
+        }
+        self._handshake_frame = self.pyon.encode(self._handshake_obj) + b"\n"
+
+    async def _handle(self, reader, writer):
+        '''
+        Per-connection coroutine; mirrors NanoNDSPHandler.handle().
+        '''
+        session = _AsyncNDSPSession(self)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            _tune_socket(sock)
+        try:
+            line = await reader.readline()
+            codec = session._select_codec(line)
+            # the asyncio reader is line-oriented, so only the
+            # newline-framed codecs (PYON, json) are supported here
+            if codec is None or not codec.use_newline_framing:
+                return
+            session._codec = codec
+
+            if codec is self.pyon:
+                writer.write(self._handshake_frame)
+            else:
+                writer.write(codec.encode_frame(self._handshake_obj))
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                return
+
+            target_name = line.decode()[:-1]
+            try:
+                target = self.targets[target_name]
+            except KeyError:
+                return
+
+            if callable(target):
+                target = target()
+
+            writer.write(session._bind_target(target))
+            await writer.drain()
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = session._process_and_pyonize(target, line)
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        '''
+        Run the server until cancelled; call via asyncio.run().
+        '''
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        async with server:
+            await server.serve_forever()
 
 #-----------------------------------------------------------------------------
 
@@ -226,6 +771,8 @@ def example_main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--port", help="server port", default=3478, type=int)
     parser.add_argument("--host", help="server hostname", default="localhost", type=str)
+    parser.add_argument("--use-asyncio", help="serve with the asyncio event loop",
+                        action="store_true")
 
     args = parser.parse_args()
 
@@ -252,8 +799,12 @@ def example_main():
     targets = {"example_adder": dev}
     description = "example adder nano_aqctl"
 
-    with NanoNDSPServer(targets, description, args.host, args.port) as server:
-        server.serve_forever()
+    if args.use_asyncio:
+        server = NanoNDSPAsyncServer(targets, description, args.host, args.port)
+        asyncio.run(server.serve_forever())
+    else:
+        with NanoNDSPServer(targets, description, args.host, args.port) as server:
+            server.serve_forever()
 
 if __name__ == "__main__":
     example_main()